@@ -1,26 +1,61 @@
 """
 TWSE API - FastAPI Application
 """
+import asyncio
+import os
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 
 from app.routers import chip
+from app.services.twse import TWSEService, create_http_client, run_daily_refresh
+
+# Allowed CORS origins, comma-separated (e.g. "https://a.example,https://b.example")
+CORS_ALLOW_ORIGINS = [
+    origin.strip()
+    for origin in os.environ.get("CORS_ALLOW_ORIGINS", "*").split(",")
+    if origin.strip()
+]
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the shared TWSE HTTP client and keep today's data warm"""
+    async with create_http_client() as client:
+        app.state.twse = TWSEService(client)
+        refresh_task = asyncio.create_task(run_daily_refresh(app.state.twse))
+        
+        yield
+        
+        refresh_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await refresh_task
+        await app.state.twse.aclose()
+
 
 app = FastAPI(
     title="TWSE API",
     description="REST API service for fetching TWSE (Taiwan Stock Exchange) chip data",
     version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=CORS_ALLOW_ORIGINS,
+    allow_credentials=False,
+    allow_methods=["GET"],
+    allow_headers=["accept", "content-type"],
 )
 
+# Compress large JSON responses (e.g. /stocks, with field names repeated per row)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # Include routers
 app.include_router(chip.router, prefix="/api/v1/chip", tags=["chip"])
 
@@ -2,11 +2,13 @@
 Chip Data Router
 API endpoints for TWSE chip (institutional investors) data
 """
-from typing import Optional
-from datetime import datetime, timezone, timedelta
-from fastapi import APIRouter, HTTPException, Query
+import time
+from typing import Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse
 
-from app.services.twse import get_twse_service, TWSEAPIError
+from app.services.twse import get_twse_service, TWSEService, TWSEAPIError
 from app.schemas.chip import (
     ChipSummary,
     StockChipList,
@@ -16,13 +18,47 @@ from app.schemas.chip import (
 
 router = APIRouter()
 
-# Taiwan timezone
-TW_TZ = timezone(timedelta(hours=8))
+# Documented query date format (YYYYMMDD, checked without a regex)
+DATE_PATTERN = r"^\d{8}$"
+
+# Taiwan UTC offset (seconds)
+TW_UTC_OFFSET = 8 * 3600
+SECONDS_PER_DAY = 86400
+
+
+# (Taiwan day number, "YYYYMMDD") of the last get_default_date() call
+_DATE_CACHE: Tuple[int, str] = (-1, "")
 
 
 def get_default_date() -> str:
-    """Get default date (today in Taiwan timezone)"""
-    return datetime.now(TW_TZ).strftime("%Y%m%d")
+    """Get default date (today in Taiwan timezone), formatted once per day"""
+    global _DATE_CACHE
+    day = (int(time.time()) + TW_UTC_OFFSET) // SECONDS_PER_DAY
+    if day != _DATE_CACHE[0]:
+        t = time.gmtime(day * SECONDS_PER_DAY)
+        _DATE_CACHE = (day, "%04d%02d%02d" % (t.tm_year, t.tm_mon, t.tm_mday))
+    return _DATE_CACHE[1]
+
+
+def valid_date(
+    date: Optional[str] = Query(
+        None,
+        description="Date in YYYYMMDD format (default: today)",
+        examples=["20250102"],
+        json_schema_extra={"pattern": DATE_PATTERN},
+    )
+) -> Optional[str]:
+    """Validate the date query parameter (8 ASCII digits, no regex engine needed)"""
+    if date is not None and (len(date) != 8 or not date.isascii() or not date.isdigit()):
+        # Same error shape FastAPI produces for Query(pattern=...)
+        raise RequestValidationError([{
+            "type": "string_pattern_mismatch",
+            "loc": ("query", "date"),
+            "msg": f"String should match pattern '{DATE_PATTERN}'",
+            "input": date,
+            "ctx": {"pattern": DATE_PATTERN},
+        }])
+    return date
 
 
 @router.get(
@@ -34,11 +70,8 @@ def get_default_date() -> str:
     }
 )
 async def get_chip_summary(
-    date: Optional[str] = Query(
-        None,
-        description="Date in YYYYMMDD format (default: today)",
-        pattern=r"^\d{8}$"
-    )
+    date: Optional[str] = Depends(valid_date),
+    service: TWSEService = Depends(get_twse_service),
 ):
     """
     取得三大法人買賣金額統計 (BFI82U)
@@ -50,11 +83,8 @@ async def get_chip_summary(
     if date is None:
         date = get_default_date()
     
-    service = get_twse_service()
-    
     try:
-        raw_data = await service.fetch_chip_summary(date)
-        result = service.parse_chip_summary(raw_data, date)
+        result = await service.get_parsed_chip_summary(date)
         return result
     except TWSEAPIError as e:
         if "沒有符合條件的資料" in str(e.message) or e.status_code == 404:
@@ -66,18 +96,16 @@ async def get_chip_summary(
 
 @router.get(
     "/stocks",
-    response_model=StockChipList,
+    response_model=None,
     responses={
+        200: {"model": StockChipList},
         404: {"model": ErrorResponse, "description": "Data not found for the specified date"},
         500: {"model": ErrorResponse, "description": "Internal server error"}
     }
 )
 async def get_stock_chip_list(
-    date: Optional[str] = Query(
-        None,
-        description="Date in YYYYMMDD format (default: today)",
-        pattern=r"^\d{8}$"
-    )
+    date: Optional[str] = Depends(valid_date),
+    service: TWSEService = Depends(get_twse_service),
 ):
     """
     取得個股三大法人買賣超列表 (T86)
@@ -89,12 +117,10 @@ async def get_stock_chip_list(
     if date is None:
         date = get_default_date()
     
-    service = get_twse_service()
-    
     try:
-        raw_data = await service.fetch_stock_chip_data(date)
-        result = service.parse_stock_chip_data(raw_data, date)
-        return result
+        columns = await service.get_parsed_stock_chip(date)
+        # Built by our own parser in StockChipList shape; skip re-validating every row
+        return ORJSONResponse(columns.stock_chip_list)
     except TWSEAPIError as e:
         if "沒有符合條件的資料" in str(e.message) or e.status_code == 404:
             raise HTTPException(status_code=404, detail=f"No data available for date: {date}")
@@ -113,11 +139,8 @@ async def get_stock_chip_list(
 )
 async def get_stock_chip_detail(
     code: str,
-    date: Optional[str] = Query(
-        None,
-        description="Date in YYYYMMDD format (default: today)",
-        pattern=r"^\d{8}$"
-    )
+    date: Optional[str] = Depends(valid_date),
+    service: TWSEService = Depends(get_twse_service),
 ):
     """
     取得個股籌碼詳情
@@ -130,12 +153,9 @@ async def get_stock_chip_detail(
     if date is None:
         date = get_default_date()
     
-    service = get_twse_service()
-    
     try:
-        raw_data = await service.fetch_stock_chip_data(date)
-        parsed_data = service.parse_stock_chip_data(raw_data, date)
-        stock_detail = service.get_stock_detail(parsed_data, code)
+        columns = await service.get_parsed_stock_chip(date)
+        stock_detail = service.get_stock_detail(columns, code)
         
         if stock_detail is None:
             raise HTTPException(status_code=404, detail=f"Stock {code} not found for date: {date}")
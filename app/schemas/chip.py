@@ -2,7 +2,7 @@
 Pydantic schemas for chip data
 """
 from typing import Optional, List, Dict, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 from datetime import date
 
 
@@ -46,6 +46,10 @@ class StockChipList(BaseModel):
     top_trust_sell: List[StockChipData] = Field(default_factory=list, description="投信賣超前10")
 
 
+# Reused validator for payloads served without a response_model (see /stocks)
+STOCK_CHIP_LIST_ADAPTER = TypeAdapter(StockChipList)
+
+
 class StockChipDetail(BaseModel):
     """個股籌碼詳情"""
     code: str
@@ -4,20 +4,127 @@ Handles all requests to Taiwan Stock Exchange API
 """
 import httpx
 import asyncio
+import functools
 import logging
-from typing import Optional, Dict, Any, List
+import math
+import random
+import ssl
+import numpy as np
+import orjson
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Tuple, Callable, Awaitable
 from datetime import datetime, timezone, timedelta
+from fastapi import Request
+
+from app.schemas.chip import STOCK_CHIP_LIST_ADAPTER
+from app.services._parse_njit import parse_int_columns
+from app.services.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
 # Taiwan timezone
 TW_TZ = timezone(timedelta(hours=8))
 
+# TWSE host
+TWSE_BASE_URL = "https://www.twse.com.tw"
+
 # Default settings
 DEFAULT_TIMEOUT = 30.0
 DEFAULT_MAX_RETRIES = 3
 DEFAULT_BASE_DELAY = 1.0
 DEFAULT_MAX_DELAY = 10.0
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+DEFAULT_MAX_CONNECTIONS = 50
+
+# T86 numeric columns: foreign buy/sell/diff, trust buy/sell/diff,
+# dealer self/hedge diff, total diff
+T86_INT_COLUMNS = (2, 3, 4, 8, 9, 10, 11, 14, 17)
+
+# Daily cache refresh time (Taiwan time), after TWSE publishes the day's data
+REFRESH_HOUR = 14
+REFRESH_MINUTE = 5
+
+# Size of the top buy/sell rankings
+TOP_N = 10
+
+
+@dataclass
+class StockChipColumns:
+    """Parsed T86 data stored column-wise, one array per field"""
+    date: str
+    codes: np.ndarray
+    names: np.ndarray
+    foreign_buy: np.ndarray
+    foreign_sell: np.ndarray
+    foreign_diff: np.ndarray
+    trust_buy: np.ndarray
+    trust_sell: np.ndarray
+    trust_diff: np.ndarray
+    dealer_diff: np.ndarray
+    total_diff: np.ndarray
+    _code_order: np.ndarray = field(init=False, repr=False)
+    _sorted_codes: np.ndarray = field(init=False, repr=False)
+    top_foreign_buy: List[int] = field(init=False, repr=False)
+    top_foreign_sell: List[int] = field(init=False, repr=False)
+    top_trust_buy: List[int] = field(init=False, repr=False)
+    top_trust_sell: List[int] = field(init=False, repr=False)
+    
+    def __post_init__(self):
+        # Sorted code index for binary-search lookups (stable: first match wins)
+        self._code_order = np.argsort(self.codes, kind="stable")
+        self._sorted_codes = self.codes[self._code_order]
+        
+        # Rankings are fixed for the day, so select them once per parse
+        self.top_foreign_buy = _top_indices(self.foreign_diff, largest=True)
+        self.top_foreign_sell = _top_indices(self.foreign_diff, largest=False)
+        self.top_trust_buy = _top_indices(self.trust_diff, largest=True)
+        self.top_trust_sell = _top_indices(self.trust_diff, largest=False)
+    
+    def __len__(self) -> int:
+        return len(self.codes)
+    
+    def find(self, code: str) -> Optional[int]:
+        """Row index of a stock code, or None if absent"""
+        pos = int(np.searchsorted(self._sorted_codes, code))
+        if pos < len(self._sorted_codes) and self._sorted_codes[pos] == code:
+            return int(self._code_order[pos])
+        return None
+    
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Materialize StockChipData dicts for all rows"""
+        return [
+            {
+                "code": code,
+                "name": name,
+                "foreign_buy": fb,
+                "foreign_sell": fs,
+                "foreign_diff": fd,
+                "trust_buy": tb,
+                "trust_sell": ts,
+                "trust_diff": td,
+                "dealer_diff": dd,
+                "total_diff": tot
+            }
+            for code, name, fb, fs, fd, tb, ts, td, dd, tot in zip(
+                self.codes.tolist(), self.names.tolist(),
+                self.foreign_buy.tolist(), self.foreign_sell.tolist(), self.foreign_diff.tolist(),
+                self.trust_buy.tolist(), self.trust_sell.tolist(), self.trust_diff.tolist(),
+                self.dealer_diff.tolist(), self.total_diff.tolist(),
+            )
+        ]
+    
+    @functools.cached_property
+    def stock_chip_list(self) -> Dict[str, Any]:
+        """StockChipList payload, built on first use and reused afterwards"""
+        stocks = self.to_dicts()
+        return {
+            "date": self.date,
+            "stocks": stocks,
+            "top_foreign_buy": [stocks[i] for i in self.top_foreign_buy],
+            "top_foreign_sell": [stocks[i] for i in self.top_foreign_sell],
+            "top_trust_buy": [stocks[i] for i in self.top_trust_buy],
+            "top_trust_sell": [stocks[i] for i in self.top_trust_sell],
+        }
 
 
 class TWSEAPIError(Exception):
@@ -28,11 +135,53 @@ class TWSEAPIError(Exception):
         super().__init__(self.message)
 
 
+def _top_indices(values: np.ndarray, largest: bool, n: int = TOP_N) -> List[int]:
+    """Indices of the n largest (or smallest) values, best first, ties in input order"""
+    keys = -values if largest else values
+    if len(keys) > n:
+        # Keep every value tied with the n-th so the result matches a stable sort
+        cutoff = np.partition(keys, n - 1)[n - 1]
+        candidates = np.flatnonzero(keys <= cutoff)
+    else:
+        candidates = np.arange(len(keys))
+    return candidates[np.argsort(keys[candidates], kind="stable")][:n].tolist()
+
+
+def create_ssl_context() -> ssl.SSLContext:
+    """
+    Build the SSL context used for TWSE requests
+
+    The TWSE certificate chain is rejected by VERIFY_X509_STRICT (enabled by
+    default since Python 3.13), so relax only that flag and keep verification on.
+    """
+    context = httpx.create_ssl_context()
+    context.verify_flags &= ~ssl.VERIFY_X509_STRICT
+    return context
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create the shared HTTP client (pooled keep-alive connections to TWSE)"""
+    return httpx.AsyncClient(
+        base_url=TWSE_BASE_URL,
+        verify=create_ssl_context(),
+        timeout=httpx.Timeout(DEFAULT_TIMEOUT),
+        limits=httpx.Limits(
+            max_keepalive_connections=DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+            max_connections=DEFAULT_MAX_CONNECTIONS,
+        ),
+        http2=True,
+    )
+
+
 class TWSEService:
     """TWSE API Service"""
     
-    def __init__(self):
-        self.base_url = "https://www.twse.com.tw"
+    def __init__(self, client: httpx.AsyncClient):
+        self._client = client
+        self._chip_summary_cache = TTLCache()
+        self._stock_chip_cache = TTLCache()
+        # In-flight loads keyed by (dataset, date), shared by concurrent callers
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
     
     def _get_today_date(self) -> str:
         """Get today's date in YYYYMMDD format (Taiwan timezone)"""
@@ -47,26 +196,17 @@ class TWSEService:
         max_delay: float = DEFAULT_MAX_DELAY,
     ) -> Dict[str, Any]:
         """
-        Fetch JSON with exponential backoff retry
+        Fetch JSON with jittered exponential backoff retry
         """
         last_exception = None
+        delay = base_delay
         
         for attempt in range(max_retries):
             try:
-                async with httpx.AsyncClient(verify=False, timeout=timeout) as client:
-                    response = await client.get(url)
-                    response.raise_for_status()
-                    data = response.json()
-                    
-                    # Validate TWSE API response
-                    if "stat" in data and data.get("stat") != "OK":
-                        raise TWSEAPIError(
-                            f"API returned error status: {data.get('stat')}",
-                            status_code=None
-                        )
-                    
-                    return data
-                    
+                response = await self._client.get(url, timeout=timeout)
+                response.raise_for_status()
+                return orjson.loads(response.content)
+                
             except httpx.TimeoutException:
                 last_exception = TWSEAPIError(f"Request timeout: {url}")
                 logger.warning(f"Timeout (attempt {attempt + 1}/{max_retries}): {url}")
@@ -83,18 +223,25 @@ class TWSEService:
                 logger.warning(f"Request error (attempt {attempt + 1}/{max_retries}): {str(e)}")
                 
             except Exception as e:
-                if isinstance(e, TWSEAPIError):
-                    raise e
                 last_exception = TWSEAPIError(f"Unknown error: {str(e)}")
                 logger.warning(f"Unknown error (attempt {attempt + 1}/{max_retries}): {str(e)}")
             
-            # Exponential backoff
+            # Decorrelated jitter backoff, so concurrent retries do not run in lockstep
             if attempt < max_retries - 1:
-                delay = min(base_delay * (2 ** attempt), max_delay)
+                delay = min(max_delay, random.uniform(base_delay, delay * 3))
                 await asyncio.sleep(delay)
         
         raise last_exception or TWSEAPIError("Request failed")
     
+    def _check_status(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate TWSE API response status"""
+        if "stat" in data and data.get("stat") != "OK":
+            raise TWSEAPIError(
+                f"API returned error status: {data.get('stat')}",
+                status_code=None
+            )
+        return data
+    
     async def fetch_chip_summary(self, date_str: Optional[str] = None) -> Dict[str, Any]:
         """
         Fetch institutional investors summary (BFI82U)
@@ -103,8 +250,8 @@ class TWSEService:
         if date_str is None:
             date_str = self._get_today_date()
         
-        url = f"{self.base_url}/rwd/zh/fund/BFI82U?response=json&date={date_str}"
-        return await self._fetch_json(url)
+        url = f"/rwd/zh/fund/BFI82U?response=json&date={date_str}"
+        return self._check_status(await self._fetch_json(url))
     
     async def fetch_stock_chip_data(self, date_str: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -114,8 +261,8 @@ class TWSEService:
         if date_str is None:
             date_str = self._get_today_date()
         
-        url = f"{self.base_url}/rwd/zh/fund/T86?response=json&date={date_str}&selectType=ALLBUT0999"
-        return await self._fetch_json(url)
+        url = f"/rwd/zh/fund/T86?response=json&date={date_str}&selectType=ALLBUT0999"
+        return self._check_status(await self._fetch_json(url))
     
     def parse_chip_summary(self, data: Dict[str, Any], date_str: str) -> Dict[str, Any]:
         """Parse chip summary response into structured format"""
@@ -152,71 +299,172 @@ class TWSEService:
         
         return result
     
-    def parse_stock_chip_data(self, data: Dict[str, Any], date_str: str) -> Dict[str, Any]:
-        """Parse stock chip data response"""
-        result = {
-            "date": date_str,
-            "stocks": [],
-            "top_foreign_buy": [],
-            "top_foreign_sell": [],
-            "top_trust_buy": [],
-            "top_trust_sell": []
-        }
+    def parse_stock_chip_data(self, data: Dict[str, Any], date_str: str) -> StockChipColumns:
+        """Parse stock chip data response into columns"""
+        # Code and name must be strings; a row with a null or numeric one is skipped
+        rows = [
+            row for row in data.get("data", [])
+            if len(row) >= 17 and isinstance(row[0], str) and isinstance(row[1], str)
+        ]
         
-        raw_data = data.get("data", [])
-        stocks = []
+        # Parse all numeric cells at once; rows with malformed numbers are dropped
+        cells = [[row[i] if i < len(row) else "" for i in T86_INT_COLUMNS] for row in rows]
+        values, valid = parse_int_columns(cells, len(T86_INT_COLUMNS))
+        rows = [row for row, ok in zip(rows, valid.tolist()) if ok]
         
-        for row in raw_data:
-            if len(row) >= 17:
-                try:
-                    code = row[0].strip()
-                    name = row[1].strip()
-                    foreign_diff = int(row[4].replace(",", ""))
-                    trust_diff = int(row[10].replace(",", ""))
-                    dealer_diff = int(row[11].replace(",", "")) + int(row[14].replace(",", ""))
-                    total_diff = int(row[17].replace(",", "")) if len(row) > 17 else foreign_diff + trust_diff + dealer_diff
-                    
-                    stock = {
-                        "code": code,
-                        "name": name,
-                        "foreign_buy": int(row[2].replace(",", "")) if row[2] else 0,
-                        "foreign_sell": int(row[3].replace(",", "")) if row[3] else 0,
-                        "foreign_diff": foreign_diff,
-                        "trust_buy": int(row[8].replace(",", "")) if row[8] else 0,
-                        "trust_sell": int(row[9].replace(",", "")) if row[9] else 0,
-                        "trust_diff": trust_diff,
-                        "dealer_diff": dealer_diff,
-                        "total_diff": total_diff
-                    }
-                    stocks.append(stock)
-                except (ValueError, IndexError, AttributeError):
-                    continue
+        (
+            foreign_buy, foreign_sell, foreign_diff,
+            trust_buy, trust_sell, trust_diff,
+            dealer_self_diff, dealer_hedge_diff, total,
+        ) = values[valid].T
+        dealer_diff = dealer_self_diff + dealer_hedge_diff
+        has_total = np.array([len(row) > 17 for row in rows], dtype=bool)
         
-        result["stocks"] = stocks
+        return StockChipColumns(
+            date=date_str,
+            codes=np.array([row[0].strip() for row in rows], dtype=str),
+            names=np.array([row[1].strip() for row in rows], dtype=str),
+            foreign_buy=foreign_buy,
+            foreign_sell=foreign_sell,
+            foreign_diff=foreign_diff,
+            trust_buy=trust_buy,
+            trust_sell=trust_sell,
+            trust_diff=trust_diff,
+            dealer_diff=dealer_diff,
+            total_diff=np.where(has_total, total, foreign_diff + trust_diff + dealer_diff),
+        )
+    
+    def _cache_ttl(self, date_str: str) -> Optional[float]:
+        """
+        Cache lifetime for a date's parsed data
         
-        # Sort and get top 10
-        result["top_foreign_buy"] = sorted(stocks, key=lambda x: x["foreign_diff"], reverse=True)[:10]
-        result["top_foreign_sell"] = sorted(stocks, key=lambda x: x["foreign_diff"])[:10]
-        result["top_trust_buy"] = sorted(stocks, key=lambda x: x["trust_diff"], reverse=True)[:10]
-        result["top_trust_sell"] = sorted(stocks, key=lambda x: x["trust_diff"])[:10]
+        Data for past trading days is final, so it is kept until evicted;
+        today's data uses the cache default TTL since TWSE may still update it.
+        """
+        if date_str < self._get_today_date():
+            return math.inf
+        return None
+    
+    async def _load_chip_summary(self, date_str: str) -> Dict[str, Any]:
+        """Fetch, parse and cache chip summary (BFI82U)"""
+        raw_data = await self.fetch_chip_summary(date_str)
+        parsed = self.parse_chip_summary(raw_data, date_str)
+        self._chip_summary_cache.set(date_str, parsed, ttl=self._cache_ttl(date_str))
+        return parsed
+    
+    def _prepare_stock_chip(self, raw_data: Dict[str, Any], date_str: str) -> StockChipColumns:
+        """Parse T86 data and build its /stocks payload (CPU-bound)"""
+        parsed = self.parse_stock_chip_data(raw_data, date_str)
+        # /stocks skips response validation, so check the payload shape once per date instead
+        STOCK_CHIP_LIST_ADAPTER.validate_python(parsed.stock_chip_list)
+        return parsed
+    
+    async def _load_stock_chip(self, date_str: str) -> StockChipColumns:
+        """Fetch, parse and cache stock chip data (T86)"""
+        raw_data = await self.fetch_stock_chip_data(date_str)
+        # Parse in a worker thread so the event loop keeps serving other requests
+        parsed = await asyncio.to_thread(self._prepare_stock_chip, raw_data, date_str)
+        self._stock_chip_cache.set(date_str, parsed, ttl=self._cache_ttl(date_str))
+        return parsed
+    
+    async def _single_flight(self, key: Tuple[str, str], load: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `load` once per key, sharing the result with concurrent callers
         
-        return result
+        The load runs as its own task, so a cancelled caller (e.g. a client
+        disconnect) does not cancel it for the others.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(load())
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._finish_flight, key))
+        return await asyncio.shield(task)
+    
+    def _finish_flight(self, key: Tuple[str, str], task: asyncio.Task) -> None:
+        """Forget a finished load"""
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception retrieved; awaiting callers re-raise it themselves
+            task.exception()
     
-    def get_stock_detail(self, stocks_data: Dict[str, Any], stock_code: str) -> Optional[Dict[str, Any]]:
+    async def get_parsed_chip_summary(self, date_str: str) -> Dict[str, Any]:
+        """Fetch and parse chip summary (BFI82U) for a date, cached per date"""
+        parsed = self._chip_summary_cache.get(date_str)
+        if parsed is None:
+            parsed = await self._single_flight(
+                ("summary", date_str), lambda: self._load_chip_summary(date_str)
+            )
+        return parsed
+    
+    async def get_parsed_stock_chip(self, date_str: str) -> StockChipColumns:
+        """
+        Fetch and parse stock chip data (T86) for a date
+        
+        T86 changes at most once a day, so parsed results are cached per date.
+        """
+        parsed = self._stock_chip_cache.get(date_str)
+        if parsed is None:
+            parsed = await self._single_flight(
+                ("stock_chip", date_str), lambda: self._load_stock_chip(date_str)
+            )
+        return parsed
+    
+    async def aclose(self) -> None:
+        """Cancel in-flight loads; call before closing the shared HTTP client"""
+        tasks = list(self._inflight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def invalidate(self, date_str: str) -> None:
+        """Drop cached results for a date"""
+        self._chip_summary_cache.pop(date_str)
+        self._stock_chip_cache.pop(date_str)
+    
+    async def prefetch(self, date_str: Optional[str] = None) -> None:
+        """Warm the caches for a date, fetching BFI82U and T86 concurrently"""
+        if date_str is None:
+            date_str = self._get_today_date()
+        
+        results = await asyncio.gather(
+            self.get_parsed_chip_summary(date_str),
+            self.get_parsed_stock_chip(date_str),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning(f"Prefetch failed for {date_str}: {result}")
+    
+    def get_stock_detail(self, columns: StockChipColumns, stock_code: str) -> Optional[Dict[str, Any]]:
         """Get specific stock detail from parsed data"""
-        for stock in stocks_data.get("stocks", []):
-            if stock["code"] == stock_code:
-                return stock
-        return None
+        index = columns.find(stock_code)
+        if index is None:
+            return None
+        # Copy the row built for the cached /stocks payload so callers cannot alter it
+        return dict(columns.stock_chip_list["stocks"][index])
+
+
+def seconds_until_refresh(now: Optional[datetime] = None) -> float:
+    """Seconds until the next daily refresh time (Taiwan time)"""
+    if now is None:
+        now = datetime.now(TW_TZ)
+    target = now.replace(hour=REFRESH_HOUR, minute=REFRESH_MINUTE, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
 
 
-# Singleton instance
-_twse_service: Optional[TWSEService] = None
+async def run_daily_refresh(service: TWSEService) -> None:
+    """Warm today's caches, then refetch them every day at the refresh time"""
+    await service.prefetch()
+    while True:
+        await asyncio.sleep(seconds_until_refresh())
+        date_str = service._get_today_date()
+        service.invalidate(date_str)
+        await service.prefetch(date_str)
 
 
-def get_twse_service() -> TWSEService:
-    """Get TWSE service instance (singleton)"""
-    global _twse_service
-    if _twse_service is None:
-        _twse_service = TWSEService()
-    return _twse_service
+def get_twse_service(request: Request) -> TWSEService:
+    """Get TWSE service instance (shared per application, see app lifespan)"""
+    return request.app.state.twse
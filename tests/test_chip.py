@@ -0,0 +1,66 @@
+"""
+Endpoint tests for the chip router
+The lifespan HTTP client is swapped for a mock TWSE transport
+"""
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main
+from app.schemas.chip import StockChipList
+from app.services.twse import TWSE_BASE_URL
+
+DATE = "20250102"
+
+
+def t86_row(code, name, foreign_diff, trust_diff):
+    """An 18-column T86 row with the given diffs"""
+    row = [code, name] + ["0"] * 16
+    row[4] = f"{foreign_diff:,}"
+    row[10] = f"{trust_diff:,}"
+    row[17] = f"{foreign_diff + trust_diff:,}"
+    return row
+
+
+T86_ROWS = [
+    t86_row(f"{1000 + i}", f"股票{i}", foreign_diff=(i * 7919) % 301 - 150, trust_diff=(i * 104729) % 41 - 20)
+    for i in range(30)
+]
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path.endswith("/T86"):
+        return httpx.Response(200, json={"stat": "OK", "data": T86_ROWS})
+    return httpx.Response(200, json={"stat": "OK", "data": []})
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(
+        app.main,
+        "create_http_client",
+        lambda: httpx.AsyncClient(base_url=TWSE_BASE_URL, transport=httpx.MockTransport(handler)),
+    )
+    with TestClient(app.main.app) as client:
+        yield client
+
+
+def test_stocks_matches_schema(client):
+    resp = client.get("/api/v1/chip/stocks", params={"date": DATE})
+
+    assert resp.status_code == 200
+    result = StockChipList.model_validate(resp.json())
+    assert result.date == DATE
+    assert [stock.code for stock in result.stocks] == [row[0] for row in T86_ROWS]
+    assert len(result.top_foreign_buy) == 10
+    assert result.top_foreign_buy[0].foreign_diff == max(stock.foreign_diff for stock in result.stocks)
+    assert result.top_trust_sell[0].trust_diff == min(stock.trust_diff for stock in result.stocks)
+
+
+def test_stock_detail(client):
+    resp = client.get("/api/v1/chip/stock/1003", params={"date": DATE})
+
+    assert resp.status_code == 200
+    assert resp.json()["code"] == "1003"
+    assert resp.json()["date"] == DATE
+    assert client.get("/api/v1/chip/stock/9999", params={"date": DATE}).status_code == 404
@@ -0,0 +1,61 @@
+"""
+Parity tests for the T86 number parsers
+The numba kernel and the plain Python fallback must agree on every cell
+"""
+import random
+
+import numpy as np
+import pytest
+
+from app.services._parse_njit import _parse_with_kernel, _parse_with_python
+
+CELLS = [
+    "", " ", "\t", "0", "7", "-7", "1,234", "-1,234,567", " 1,000 ", "\t7", "7\n",
+    ",", "-", "-,", "-,5", "1,,2", "+5", "--5", "1-2", "1.5", "1_000", "abc",
+    "股", "　", "　7", "١٢", "999999999999999999", "-999999999999999999",
+    "1000000000000000000", "1,000,000,000,000,000,000",
+]
+
+
+def assert_same(cells, n_cols):
+    kernel_values, kernel_valid = _parse_with_kernel(cells, n_cols)
+    python_values, python_valid = _parse_with_python(cells, n_cols)
+    np.testing.assert_array_equal(kernel_valid, python_valid)
+    np.testing.assert_array_equal(kernel_values, python_values)
+
+
+@pytest.mark.parametrize("cell", CELLS)
+def test_single_cell_parity(cell):
+    assert_same([[cell]], 1)
+
+
+def test_known_values():
+    values, valid = _parse_with_python([["1,234", "-56", ""], ["+5", "1", "2"]], 3)
+    assert valid.tolist() == [True, False]
+    assert values.tolist() == [[1234, -56, 0], [0, 0, 0]]
+
+
+@pytest.mark.parametrize("cell", [None, 0, 1234, -5, 1.5])
+def test_non_str_cell_marks_row_invalid(cell):
+    rows = [["1,234", cell, "5"], ["1", "2", "3"]]
+    assert_same(rows, 3)
+    values, valid = _parse_with_python(rows, 3)
+    assert valid.tolist() == [False, True]
+    assert values.tolist() == [[0, 0, 0], [1, 2, 3]]
+
+
+def test_random_rows_parity():
+    rng = random.Random(0)
+    alphabet = "0123456789,- \t+.x"
+    cells = [
+        ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 8))) for _ in range(3)]
+        for _ in range(2000)
+    ]
+    assert_same(cells, 3)
+
+
+def test_empty_input():
+    assert_same([], 9)
+    values, valid = _parse_with_python([], 9)
+    assert values.shape == (0, 9)
+    assert valid.shape == (0,)
@@ -0,0 +1,151 @@
+"""
+Tests for the TWSE service
+Parsing, rankings and the single-flight cache loads
+"""
+import asyncio
+
+import httpx
+import numpy as np
+import pytest
+
+from app.services.twse import TWSE_BASE_URL, TWSEAPIError, TWSEService, _top_indices
+
+DATE = "20250102"
+
+
+def t86_row(code, name, foreign_diff=0, trust_diff=0):
+    """An 18-column T86 row with the given diffs (buy/sell and dealer cells left at 0)"""
+    row = [code, name] + ["0"] * 16
+    row[4] = f"{foreign_diff:,}"
+    row[10] = f"{trust_diff:,}"
+    row[17] = f"{foreign_diff + trust_diff:,}"
+    return row
+
+
+def t86_payload(*rows):
+    return {"stat": "OK", "data": list(rows) or [t86_row("2330", "台積電", foreign_diff=1_234)]}
+
+
+def make_service(handler=None):
+    if handler is None:
+        handler = lambda request: httpx.Response(500)
+    client = httpx.AsyncClient(base_url=TWSE_BASE_URL, transport=httpx.MockTransport(handler))
+    return TWSEService(client)
+
+
+@pytest.mark.parametrize("bad", [None, 7])
+@pytest.mark.parametrize("index", [0, 1, 2, 10])
+def test_parse_skips_rows_with_non_str_cells(bad, index):
+    row = t86_row("1101", "台泥", foreign_diff=5)
+    row[index] = bad
+    data = {"data": [row, t86_row("2330", "台積電", foreign_diff=1_234)]}
+    
+    columns = make_service().parse_stock_chip_data(data, DATE)
+    
+    assert columns.codes.tolist() == ["2330"]
+    assert columns.foreign_diff.tolist() == [1234]
+
+
+def test_stock_detail_is_a_copy():
+    data = {"data": [t86_row("2330", "台積電", foreign_diff=1_234)]}
+    service = make_service()
+    columns = service.parse_stock_chip_data(data, DATE)
+    
+    detail = service.get_stock_detail(columns, "2330")
+    detail["foreign_diff"] = 0
+    
+    assert columns.stock_chip_list["stocks"][0]["foreign_diff"] == 1234
+    assert columns.stock_chip_list["top_foreign_buy"][0]["foreign_diff"] == 1234
+    assert service.get_stock_detail(columns, "2330")["foreign_diff"] == 1234
+    assert service.get_stock_detail(columns, "0050") is None
+
+
+def sorted_top(values, largest):
+    """Reference ranking: the stable sort the rankings used before np.partition"""
+    return sorted(range(len(values)), key=lambda i: values[i], reverse=largest)[:10]
+
+
+@pytest.mark.parametrize("largest", [True, False])
+@pytest.mark.parametrize("n_rows,n_values", [(0, 3), (1, 3), (9, 3), (10, 3), (11, 3), (200, 3), (200, 50), (1000, 2)])
+def test_top_indices_matches_stable_sort(largest, n_rows, n_values):
+    rng = np.random.default_rng(n_rows * 100 + n_values)
+    for _ in range(20):
+        values = rng.integers(-n_values, n_values + 1, size=n_rows).astype(np.int64)
+        assert _top_indices(values, largest=largest) == sorted_top(values.tolist(), largest)
+
+
+def test_concurrent_cold_loads_fetch_once():
+    calls = []
+    
+    async def handler(request):
+        calls.append(request.url)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json=t86_payload())
+    
+    async def main():
+        service = make_service(handler)
+        results = await asyncio.gather(*(service.get_parsed_stock_chip(DATE) for _ in range(20)))
+        assert all(result is results[0] for result in results)
+        assert results[0].codes.tolist() == ["2330"]
+        assert not service._inflight
+    
+    asyncio.run(main())
+    assert len(calls) == 1
+
+
+def test_failed_load_reaches_every_waiter_and_is_retried():
+    calls = []
+    stat = "很抱歉，沒有符合條件的資料!"
+    
+    async def handler(request):
+        calls.append(request.url)
+        await asyncio.sleep(0.01)
+        if len(calls) == 1:
+            return httpx.Response(200, json={"stat": stat})
+        return httpx.Response(200, json=t86_payload())
+    
+    async def main():
+        service = make_service(handler)
+        results = await asyncio.gather(
+            *(service.get_parsed_stock_chip(DATE) for _ in range(20)), return_exceptions=True
+        )
+        assert all(isinstance(result, TWSEAPIError) for result in results)
+        assert len(calls) == 1
+        assert not service._inflight
+        
+        columns = await service.get_parsed_stock_chip(DATE)
+        assert columns.codes.tolist() == ["2330"]
+    
+    asyncio.run(main())
+    assert len(calls) == 2
+
+
+def test_cancelled_caller_does_not_cancel_shared_load():
+    calls = []
+    
+    async def main():
+        release = asyncio.Event()
+        
+        async def handler(request):
+            calls.append(request.url)
+            await release.wait()
+            return httpx.Response(200, json=t86_payload())
+        
+        service = make_service(handler)
+        first = asyncio.create_task(service.get_parsed_stock_chip(DATE))
+        second = asyncio.create_task(service.get_parsed_stock_chip(DATE))
+        await asyncio.sleep(0.01)
+        
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        columns = await second
+        assert columns.codes.tolist() == ["2330"]
+        # The load completed and cached its result, so no new fetch is needed
+        assert await service.get_parsed_stock_chip(DATE) is columns
+    
+    asyncio.run(main())
+    assert len(calls) == 1